@@ -1,5 +1,8 @@
 import sys
 import io
+import os
+import json
+import random
 sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding = 'utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.detach(), encoding = 'utf-8')
 
@@ -38,31 +41,65 @@ class CardDeck:
 
     Class attributes:
     deck
+    rng
+    running_count
+    composition
 
     Class methods:
     __init__
     shuffle_deck
     deal_card
+    save_state
+    load_state
     '''
 
     valid_ranks = ["2", "3", "4", "5", "6", "7", "8", "9", "10",
                 "J", "Q", "K", "A"]
     valid_suits = ["♦", "♠", "♥", "♣"]
+    hilo_dict = {
+        "2": 1, "3": 1, "4": 1, "5": 1, "6": 1, "7": 0, "8": 0, "9": 0,
+        "10": -1, "J": -1, "Q": -1, "K": -1, "A": -1}
 
-    def __init__(self, num_decks):
+    def __init__(self, num_decks, rng=None):
+        self.rng = rng or random
         self.deck = num_decks * [PlayingCard(rank, suit) for suit in
                                 CardDeck.valid_suits for rank in
                                 CardDeck.valid_ranks]
+        self.running_count = 0
+        self.composition = 10 * [0]
+        for card in self.deck:
+            self.composition[card.value - 2] += 1
         self.shuffle_deck()
 
     def shuffle_deck(self):
-        from random import sample
-        self.deck = sample(self.deck, len(self.deck))
+        self.deck = self.rng.sample(self.deck, len(self.deck))
 
     def deal_card(self):
         card = self.deck.pop(0)
+        self.running_count += CardDeck.hilo_dict[card.rank]
+        self.composition[card.value - 2] -= 1
         return card
 
+    def save_state(self):
+        # One byte per card: its index among the 52 distinct cards.
+        index = {(rank, suit): i for i, (rank, suit) in enumerate(
+            (rank, suit) for suit in CardDeck.valid_suits
+            for rank in CardDeck.valid_ranks)}
+        return bytes(index[(card.rank, card.suit)] for card in self.deck)
+
+    def load_state(self, data):
+        cards = [PlayingCard(rank, suit) for suit in CardDeck.valid_suits
+                for rank in CardDeck.valid_ranks]
+        if any(i >= len(cards) for i in data):
+            raise ValueError("invalid card in saved deck")
+        self.deck = [cards[i] for i in data]
+        # Every full deck counts to zero, so the cards already dealt
+        # count to minus whatever is left in the shoe.
+        self.running_count = -sum(CardDeck.hilo_dict[card.rank] for card in self.deck)
+        self.composition = 10 * [0]
+        for card in self.deck:
+            self.composition[card.value - 2] += 1
+
 class CardHand:
     '''This class represents a hand of cards - either of a player,
     or of the dealer, in a Blackjack game round.
@@ -165,6 +202,7 @@ class GameRound:
     split3
     hand_list
     result_list
+    count
 
     Class methods:
     deal_cards
@@ -189,6 +227,7 @@ class GameRound:
     def __init__(self, deck, bet):
         self.player = CardHand(bet)
         self.dealer = CardHand(0)
+        self.count = deck.running_count
         self.deal_cards(deck)
         self.split_count = 0
         self.setup_split(bet)
@@ -359,10 +398,1033 @@ class GameRound:
         print("Your winnings for this round are: ${:,.2f}".format(self.winnings))
         print("")
 
-class GameAction:
+class StrategyTable:
+    '''
+    This class holds the basic strategy chart that an automated player
+    follows in place of the hit, split and insurance prompts.
+
+    The chart is worked out for this game's rules - any 21 pays 3 to 2 and
+    the dealer hits every soft total short of 21 - by valuing each play
+    with a DecisionAdvisor on a fresh shoe. Being a total-based chart, it
+    is still an approximation of the best play for any particular shoe.
+
+    The chart is stored in a fixed binary layout - an 8-byte header and then
+    one byte per (row, dealer upcard) cell, upcards 2 to A left to right -
+    and memory-mapped read-only, so every process reading the same file
+    shares one copy of it and a lookup is a single index into the map.
+
+    Row blocks, in file order:
+    hard totals 4 to 21, soft totals 12 to 21, pairs of 2 to A, insurance.
+
+    Cell codes:
+    H hit, S stand, D double or else hit, B double or else stand,
+    P split, R surrender or else hit, T surrender or else stand,
+    Y/N take insurance or not.
+
+    Class attributes:
+    path
+    table
+
+    Class methods:
+    __init__
+    valid
+    hand_code
+    build
+    cell
+    action
+    split_action
+    insure_action
+    '''
+
+    header = b"BJST\x03\x00\x00\x00"
+    columns = 10
+    hard_totals = range(4, 22)
+    soft_totals = range(12, 22)
+    pair_values = range(2, 12)
+    hard_offset = len(header)
+    soft_offset = hard_offset + len(hard_totals) * columns
+    pair_offset = soft_offset + len(soft_totals) * columns
+    insurance_offset = pair_offset + len(pair_values) * columns
+    size = insurance_offset + columns
+
+    def __init__(self, path="showdown.bst"):
+        import mmap
+        self.path = path
+        if not StrategyTable.valid(self.path):
+            StrategyTable.build(self.path)
+        with open(self.path, "rb") as file:
+            self.table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if (self.table[:len(StrategyTable.header)] != StrategyTable.header
+                or len(self.table) != StrategyTable.size):
+            raise ValueError("{} is not a valid strategy table".format(self.path))
+
+    @staticmethod
+    def valid(path):
+        try:
+            with open(path, "rb") as file:
+                header = file.read(len(StrategyTable.header))
+            return header == StrategyTable.header and os.path.getsize(path) == StrategyTable.size
+        except OSError:
+            return False
+
+    @staticmethod
+    def hand_code(advisor, results, total, soft):
+        if total == 21:
+            return "S"
+        stand = advisor.stand_ev(results, total)
+        hit = advisor.hit_ev(results, total, soft, True)
+        double = advisor.double_ev(results, total, soft)
+        best = max(stand, hit, double, -0.5)
+        if best == double:
+            return "B" if stand > hit else "D"
+        if best == -0.5:
+            return "R" if hit >= stand else "T"
+        return "S" if stand >= hit else "H"
+
+    @staticmethod
+    def build(path, num_decks=6):
+        # Every cell is the best play under this game's rules, as valued by
+        # DecisionAdvisor for a fresh shoe less the dealer's upcard.
+        advisor = DecisionAdvisor()
+        ranks = {value: rank for rank, value in PlayingCard.value_dict.items()
+                 if rank not in ["J", "Q", "K"]}
+        hard = {total: "" for total in StrategyTable.hard_totals}
+        soft = {total: "" for total in StrategyTable.soft_totals}
+        pairs = {value: "" for value in StrategyTable.pair_values}
+        insurance = ""
+        for upcard in range(2, 12):
+            composition = [4 * num_decks] * 10
+            composition[8] = 16 * num_decks
+            composition[upcard - 2] -= 1
+            results = advisor.results(tuple(composition), PlayingCard(ranks[upcard], "♠"))
+            for total in hard:
+                hard[total] += StrategyTable.hand_code(advisor, results, total, False)
+            for total in soft:
+                soft[total] += StrategyTable.hand_code(advisor, results, total, True)
+            for value in pairs:
+                total, is_soft = DecisionAdvisor.add_card(
+                    *DecisionAdvisor.add_card(0, False, value), value)
+                best = max(advisor.best_ev(results, total, is_soft, True), -0.5)
+                if advisor.split_ev(results, PlayingCard(ranks[value], "♠")) > best:
+                    pairs[value] += "P"
+                else:
+                    pairs[value] += StrategyTable.hand_code(advisor, results, total, is_soft)
+            needed = 21 - upcard
+            unseen = sum(composition)
+            if 2 <= needed <= 11 and 3 * composition[needed - 2] / unseen > 1:
+                insurance += "Y"
+            else:
+                insurance += "N"
+        rows = [hard[total] for total in StrategyTable.hard_totals]
+        rows += [soft[total] for total in StrategyTable.soft_totals]
+        rows += [pairs[value] for value in StrategyTable.pair_values]
+        rows.append(insurance)
+        # Each process writes its own temporary file, so workers starting
+        # together never truncate each other's copy.
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as file:
+            file.write(StrategyTable.header + "".join(rows).encode("ascii"))
+        os.replace(temp_path, path)
+
+    def cell(self, offset, row, upcard):
+        return chr(self.table[offset + row * StrategyTable.columns + upcard.value - 2])
+
+    def action(self, hand, upcard):
+        score = hand.score()
+        if hand.score_type() == "soft":
+            return self.cell(StrategyTable.soft_offset, score - 12, upcard)
+        return self.cell(StrategyTable.hard_offset, min(max(score, 4), 21) - 4, upcard)
+
+    def split_action(self, hand, upcard):
+        return self.cell(StrategyTable.pair_offset, hand.hand[0].value - 2, upcard)
+
+    def insure_action(self, upcard):
+        return self.cell(StrategyTable.insurance_offset, 0, upcard)
+
+class GameSession:
+    '''
+    This class holds the session loop shared by GameAction and
+    StrategyPlayer: when a game is over, where each round's bet comes
+    from, and what happens when the shoe runs out in the middle of a round.
+
+    A session ends when the deck is down to 10 cards (game mode "D") or
+    the rounds are played (game mode "R"), when it has no cards left, or
+    when the balance drops to 1. A round the shoe cannot finish is called
+    off with every bet returned, and ends the session.
+
+    Class attributes:
+    deck
+    balance
+    game_mode
+    num_rounds
+    round
+    policy
+    last_bet
+    last_units
+
+    Class methods:
+    over
+    place_bet
+    session_over
+    true_count
+    policy_bet
+    session_script
+    void_script
+    checkpoint_script
+    '''
+
+    @staticmethod
+    def over(game_mode, cards_left, round, num_rounds, balance):
+        if cards_left == 0 or balance <= 1:
+            return True
+        if game_mode == "D":
+            return cards_left <= 10
+        return num_rounds - round <= 0
+
+    @staticmethod
+    def place_bet(policy, balance, true_count, last_bet, last_units):
+        bet = int(policy.bet(balance, true_count, last_bet, last_units))
+        return min(max(bet, 1), int(balance))
+
+    def session_over(self):
+        return GameSession.over(self.game_mode, len(self.deck.deck), self.round,
+                                getattr(self, "num_rounds", 0), self.balance)
+
+    def true_count(self):
+        return self.deck.running_count / (len(self.deck.deck) / 52)
+
+    def policy_bet(self):
+        return GameSession.place_bet(self.policy, self.balance, self.true_count(),
+                                     self.last_bet, self.last_units)
+
+    def session_script(self):
+        while not self.session_over():
+            balance = self.balance
+            self.round += 1
+            try:
+                self.round_script()
+            except IndexError:
+                if self.deck.deck:
+                    raise
+                self.round -= 1
+                self.balance = balance
+                self.void_script()
+                break
+            self.last_units = (self.balance - balance) / self.last_bet
+            self.checkpoint_script()
+
+    def void_script(self):
+        pass
+
+    def checkpoint_script(self):
+        pass
+
+class StrategyPlayer(GameSession):
+    '''
+    This class plays rounds of Blackjack without user input, taking every
+    insurance, split and hit decision from a StrategyTable and keeping the
+    balance the same way GameAction does. With a bet-sizing policy, it
+    plays whole sessions through GameSession.session_script.
+
+    When record is a list, each round played in the session loop appends
+    the cards left and true count before the deal, the net result in bets
+    and the stake taken beyond the bet, in bets.
+
+    Class attributes:
+    deck
+    balance
+    table
+    roundx
+    record
+    lowest_balance
+    round_cards
+    voided
+
+    Class methods:
+    __init__
+    round_script
+    void_script
+    stake
+    round_play
+    insurance_play
+    split_play
+    hit_play
+    settle_play
+    '''
+
+    def __init__(self, deck, balance, table, policy=None, game_mode="D", num_rounds=0):
+        self.deck = deck
+        self.balance = balance
+        self.table = table
+        self.policy = policy
+        self.game_mode = game_mode
+        self.num_rounds = num_rounds
+        self.round = 0
+        self.last_bet = 0
+        self.last_units = 0
+        self.record = None
+        self.lowest_balance = balance
+        self.round_cards = len(deck.deck)
+        self.voided = False
+
+    def round_script(self):
+        self.round_cards = len(self.deck.deck)
+        true_count = self.true_count()
+        balance = self.balance
+        bet = self.policy_bet()
+        self.lowest_balance = balance - bet
+        self.round_play(bet)
+        if self.record is not None:
+            self.record.append((self.round_cards, true_count, (self.balance - balance) / bet,
+                                (balance - bet - self.lowest_balance) / bet))
+
+    def void_script(self):
+        self.voided = True
+
+    def stake(self, amount):
+        self.balance -= amount
+        self.lowest_balance = min(self.lowest_balance, self.balance)
+
+    def round_play(self, bet):
+        self.last_bet = bet
+        self.balance -= bet
+        self.roundx = GameRound(self.deck, bet)
+        self.insurance_play()
+        if self.roundx.dealer.blackjack_check():
+            self.roundx.player.stand()
+        elif self.roundx.player.blackjack_check():
+            self.roundx.player.stand()
+            self.roundx.dealer.stand()
+        else:
+            self.split_play()
+            for hand in self.roundx.hand_list:
+                if len(hand.hand) > 0 and hand.blackjack_check():
+                    hand.stand()
+                elif len(hand.hand) > 0 and hand.stop == False:
+                    self.hit_play(hand)
+        self.settle_play()
+        return self.roundx
+
+    def insurance_play(self):
+        upcard = self.roundx.dealer.hand[0]
+        if (self.roundx.insurable() and self.balance >= (self.roundx.player.bet / 2)
+                and self.table.insure_action(upcard) == "Y"):
+            self.roundx.insure()
+            self.stake(self.roundx.player.bet / 2)
+
+    def split_play(self):
+        upcard = self.roundx.dealer.hand[0]
+        for hand in self.roundx.hand_list:
+            while (hand.splittable() and self.roundx.split_count < 3
+                    and self.balance >= self.roundx.player.bet
+                    and self.table.split_action(hand, upcard) == "P"):
+                self.stake(self.roundx.player.bet)
+                self.roundx.split(hand, self.deck)
+
+    def hit_play(self, hand):
+        upcard = self.roundx.dealer.hand[0]
+        while hand.score() < 21 and not hand.stop:
+            action = self.table.action(hand, upcard)
+            first = len(hand.hand) == 2
+            # GameAction offers Double-Down after a hit too, and the chart
+            # is built assuming it.
+            if action in "DB" and self.balance >= hand.bet:
+                self.stake(hand.bet)
+                hand.double_down(self.deck)
+            elif action in "RT" and first and self.roundx.split_count == 0:
+                hand.surrender()
+                self.balance += hand.bet
+            elif action in "SBT":
+                hand.stand()
+            else:
+                hand.hit(self.deck)
+            if hand.abandon:
+                break
+        hand.stand()
+
+    def settle_play(self):
+        self.roundx.settle(self.deck)
+        self.balance += self.roundx.winnings
+
+class RoundExporter:
+    '''
+    This class writes one record per settled round to a directory of
+    column files, for analysis outside the game.
+
+    Each column is a plain .npy file, so numpy.load(path, mmap_mode="r")
+    reads it straight into an array without parsing any text. Rows are
+    kept in small buffers and appended every chunk_size rounds, and the
+    row count in each file header is updated on every flush, so the files
+    are always loadable and never need to be held in memory as a whole.
+    Exporting into an existing directory appends to its columns. Bytes
+    past the row count in a header, left by an interrupted flush, are cut
+    off before anything is appended, and columns of different lengths are
+    cut back to the shortest one.
+
+    Result columns hold 0 for no hand, 1 won, 2 tied, 3 lost, 4 surrendered.
+
+    Class attributes:
+    path
+    chunk_size
+    rows
+    buffers
+
+    Class methods:
+    __init__
+    column_path
+    write_header
+    read_rows
+    truncate
+    record
+    flush
+    close
+    '''
+
+    columns = [
+        ("round", "i"), ("bet", "d"), ("insurance", "d"), ("split_count", "b"),
+        ("result_1", "b"), ("result_2", "b"), ("result_3", "b"), ("result_4", "b"),
+        ("dealer_score", "b"), ("winnings", "d"), ("balance", "d"), ("count", "i")]
+    result_codes = {"won": 1, "tied": 2, "lost": 3, "surrendered": 4}
+    header_size = 128
+
+    def __init__(self, path, chunk_size=65536):
+        from array import array
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.buffers = {name: array(typecode) for name, typecode in RoundExporter.columns}
+        os.makedirs(self.path, exist_ok=True)
+        if all(os.path.isfile(self.column_path(name)) for name, typecode in RoundExporter.columns):
+            self.rows = self.read_rows()
+            self.truncate(self.rows)
+        else:
+            self.rows = 0
+            for name, typecode in RoundExporter.columns:
+                with open(self.column_path(name), "wb") as file:
+                    self.write_header(file, name, 0)
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + ".npy")
+
+    def write_header(self, file, name, rows):
+        # Fixed-size .npy (version 1.0) header, padded with spaces so the
+        # row count can be rewritten in place as the file grows.
+        buffer = self.buffers[name]
+        descr = ("<" if sys.byteorder == "little" else ">") + buffer.typecode.replace(
+            "b", "i").replace("d", "f") + str(buffer.itemsize)
+        header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(
+            descr, rows)
+        header = header.ljust(RoundExporter.header_size - 11) + "\n"
+        file.seek(0)
+        file.write(b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little")
+                   + header.encode("ascii"))
+
+    def read_rows(self):
+        rows = set()
+        for name, typecode in RoundExporter.columns:
+            with open(self.column_path(name), "rb") as file:
+                header = file.read(RoundExporter.header_size).decode("latin-1")
+            rows.add(int(header.split("'shape': (")[1].split(",")[0]))
+        return min(rows)
+
+    def truncate(self, rows):
+        # Drops every row from the given one on, in all columns, along
+        # with any bytes an interrupted flush left past the header count.
+        self.rows = min(rows, self.rows)
+        for name, typecode in RoundExporter.columns:
+            with open(self.column_path(name), "r+b") as file:
+                file.truncate(RoundExporter.header_size + self.rows * self.buffers[name].itemsize)
+                self.write_header(file, name, self.rows)
+
+    def record(self, round_number, roundx, balance):
+        results = [RoundExporter.result_codes[result] for result in roundx.result_list]
+        results += (4 - len(results)) * [0]
+        values = [round_number, roundx.getbet(), roundx.insurance, roundx.split_count]
+        values += results
+        values += [roundx.dealer.score(), roundx.winnings, balance, roundx.count]
+        for (name, typecode), value in zip(RoundExporter.columns, values):
+            self.buffers[name].append(value)
+        if len(self.buffers["round"]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        pending = len(self.buffers["round"])
+        if pending == 0:
+            return
+        for name, typecode in RoundExporter.columns:
+            with open(self.column_path(name), "r+b") as file:
+                file.seek(RoundExporter.header_size + self.rows * self.buffers[name].itemsize)
+                file.truncate()
+                self.buffers[name].tofile(file)
+                self.write_header(file, name, self.rows + pending)
+            del self.buffers[name][:]
+        self.rows += pending
+
+    def close(self):
+        self.flush()
+
+class DecisionAdvisor:
+    '''
+    This class estimates the expected value of every legal action at a
+    decision point, in units of the hand's bet, from the composition of
+    the cards the player has not seen - the cards left in the CardDeck
+    plus the dealer's hole card.
+
+    Draws are weighted by that composition, which is kept up to date by
+    the deck as cards are dealt, while the few cards drawn later in the
+    same round are not removed again. Nearly every prompt sees a new
+    composition, so nothing is kept between prompts: each one is worked
+    out afresh, in a pass over a few dozen hand totals that takes around
+    a millisecond whatever the size of the shoe.
+    GameAction offers Double-Down again after a hit, so the value of a hit
+    counts later doubles when doubling is allowed at the prompt.
+
+    Class methods:
+    unseen
+    results
+    add_card
+    dealer_outcomes
+    stand_ev
+    best_ev
+    hit_ev
+    double_ev
+    split_ev
+    hand_evs
+    insurance_ev
+    '''
+
+    def unseen(self, roundx, deck):
+        composition = list(deck.composition)
+        hole_card = roundx.dealer.hand[1]
+        composition[hole_card.value - 2] += 1
+        return tuple(composition)
+
+    def results(self, composition, upcard):
+        # The "best" and "hit" tables are filled in as hands are valued.
+        total = sum(composition)
+        probabilities = [(value + 2, count / total)
+                         for value, count in enumerate(composition) if count > 0]
+        results = {"probabilities": probabilities, "upcard": upcard.value,
+                   "dealer": None, "best": {}, "hit": {}}
+        results["dealer"] = self.dealer_outcomes(results)
+        return results
+
+    @staticmethod
+    def add_card(total, soft, value):
+        if value == 11:
+            if total + 11 <= 21:
+                return total + 11, True
+            total += 1
+        else:
+            total += value
+        if total > 21 and soft:
+            return total - 10, False
+        return total, soft
+
+    def dealer_outcomes(self, results):
+        # Final dealer totals 17 to 21, with 22 for a bust. The dealer hits
+        # below 17 and on every soft total short of 21, as in
+        # GameRound.dealer_turn, and play only reaches the player when
+        # the dealer has no two-card 21.
+        memo = {}
+        def finish(total, soft):
+            if total > 21:
+                return {22: 1.0}
+            if total >= 17 and (not soft or total == 21):
+                return {total: 1.0}
+            if (total, soft) not in memo:
+                outcomes = {}
+                for value, probability in results["probabilities"]:
+                    for final, p in finish(*DecisionAdvisor.add_card(total, soft, value)).items():
+                        outcomes[final] = outcomes.get(final, 0) + probability * p
+                memo[(total, soft)] = outcomes
+            return memo[(total, soft)]
+
+        upcard = results["upcard"]
+        hole = [(value, probability) for value, probability in results["probabilities"]
+                if upcard + value != 21]
+        no_blackjack = sum(probability for value, probability in hole)
+        outcomes = {}
+        for value, probability in hole:
+            start = DecisionAdvisor.add_card(upcard, upcard == 11, value)
+            for final, p in finish(*start).items():
+                outcomes[final] = outcomes.get(final, 0) + probability / no_blackjack * p
+        return outcomes
+
+    def stand_ev(self, results, total):
+        ev = 0
+        for final, probability in results["dealer"].items():
+            if total == 21:
+                ev += 0 if final == 21 else 1.5 * probability
+            elif final == 21:
+                ev -= probability
+            elif final == 22 or final < total:
+                ev += probability
+            elif final > total:
+                ev -= probability
+        return ev
+
+    def best_ev(self, results, total, soft, can_double):
+        if total > 21:
+            return -1
+        key = (total, soft, can_double)
+        if key not in results["best"]:
+            ev = self.stand_ev(results, total)
+            if total < 21:
+                ev = max(ev, self.hit_ev(results, total, soft, can_double))
+                if can_double:
+                    ev = max(ev, self.double_ev(results, total, soft))
+            results["best"][key] = ev
+        return results["best"][key]
+
+    def hit_ev(self, results, total, soft, can_double):
+        key = (total, soft, can_double)
+        if key not in results["hit"]:
+            results["hit"][key] = sum(
+                probability * self.best_ev(
+                    results, *DecisionAdvisor.add_card(total, soft, value), can_double)
+                for value, probability in results["probabilities"])
+        return results["hit"][key]
+
+    def double_ev(self, results, total, soft):
+        ev = 0
+        for value, probability in results["probabilities"]:
+            new_total, new_soft = DecisionAdvisor.add_card(total, soft, value)
+            ev += probability * (-1 if new_total > 21 else self.stand_ev(results, new_total))
+        return 2 * ev
+
+    def split_ev(self, results, card):
+        # Each half gets one more card; split aces must stand, other hands
+        # play on with hit, stand or double. Resplits are not counted.
+        ev = 0
+        first = DecisionAdvisor.add_card(0, False, card.value)
+        for value, probability in results["probabilities"]:
+            total, soft = DecisionAdvisor.add_card(*first, value)
+            if card.rank == "A":
+                ev += probability * self.stand_ev(results, total)
+            else:
+                ev += probability * self.best_ev(results, total, soft, True)
+        return 2 * ev
+
+    def hand_evs(self, roundx, deck, hand, actions):
+        results = self.results(self.unseen(roundx, deck), roundx.dealer.hand[0])
+        total, soft = hand.score(), hand.score_type() == "soft"
+        can_double = "DD" in actions
+        evs = {}
+        for action in actions:
+            if action == "H":
+                evs["Hit"] = self.hit_ev(results, total, soft, can_double)
+            elif action == "S":
+                evs["Stand"] = self.stand_ev(results, total)
+            elif action == "DD":
+                evs["Double-Down"] = self.double_ev(results, total, soft)
+            elif action == "R":
+                evs["suRrender"] = -0.5
+            elif action == "P":
+                evs["Split"] = self.split_ev(results, hand.hand[0])
+        return evs
+
+    def insurance_ev(self, roundx, deck):
+        # Per unit of insurance: it pays 2 to 1 when the hole card
+        # completes a dealer 21, and is lost otherwise.
+        composition = self.unseen(roundx, deck)
+        upcard = roundx.dealer.hand[0].value
+        needed = 21 - upcard
+        if not 2 <= needed <= 11:
+            return -1
+        return 3 * composition[needed - 2] / sum(composition) - 1
+
+class FlatBet:
+    '''
+    This class is a bet-sizing policy that bets the same amount every round.
+
+    Class attributes:
+    name
+    unit
+
+    Class methods:
+    __init__
+    bet
+    '''
+
+    def __init__(self, unit=10):
+        self.name = "Flat ${}".format(unit)
+        self.unit = unit
+
+    def bet(self, balance, true_count, last_bet, last_units):
+        return self.unit
+
+class KellyBet:
+    '''
+    This class is a bet-sizing policy that bets a fraction of the Kelly
+    stake, with the player's edge estimated from the true count as
+    base_edge + edge_per_count * true_count. It bets the minimum unit
+    whenever that edge is not positive.
+
+    Class attributes:
+    name
+    fraction
+    base_edge
+    edge_per_count
+    variance
+    unit
+
+    Class methods:
+    __init__
+    bet
+    '''
+
+    def __init__(self, fraction=0.5, base_edge=-0.005, edge_per_count=0.005,
+                 variance=1.3, unit=10):
+        self.name = "Kelly x{:g}".format(fraction)
+        self.fraction = fraction
+        self.base_edge = base_edge
+        self.edge_per_count = edge_per_count
+        self.variance = variance
+        self.unit = unit
+
+    def bet(self, balance, true_count, last_bet, last_units):
+        edge = self.base_edge + self.edge_per_count * true_count
+        if edge <= 0:
+            return self.unit
+        return max(self.unit, self.fraction * edge / self.variance * balance)
+
+class MartingaleBet:
+    '''
+    This class is a bet-sizing policy that doubles the bet after every
+    losing round and goes back to the base unit after any other round.
+
+    Class attributes:
+    name
+    unit
+
+    Class methods:
+    __init__
+    bet
+    '''
+
+    def __init__(self, unit=10):
+        self.name = "Martingale ${}".format(unit)
+        self.unit = unit
+
+    def bet(self, balance, true_count, last_bet, last_units):
+        if last_units < 0:
+            return 2 * last_bet
+        return self.unit
+
+class SpreadBet:
+    '''
+    This class is a bet-sizing policy that ramps the bet with the true
+    count: ramp is a list of (true count, multiple of unit) steps, and the
+    highest step reached applies.
+
+    Class attributes:
+    name
+    unit
+    ramp
+
+    Class methods:
+    __init__
+    bet
+    '''
+
+    def __init__(self, unit=10, ramp=((1, 1), (2, 2), (3, 4), (4, 8))):
+        self.name = "Spread 1-{}".format(max(multiple for count, multiple in ramp))
+        self.unit = unit
+        self.ramp = sorted(ramp)
+
+    def bet(self, balance, true_count, last_bet, last_units):
+        multiple = 1
+        for count, step in self.ramp:
+            if true_count >= count:
+                multiple = step
+        return multiple * self.unit
+
+def record_sessions(seeds, num_decks, game_mode, num_rounds, table_path):
+    # Plays the session of every seed at a 1-unit bet with unlimited funds,
+    # and returns per round the cards left and true count before the deal,
+    # the net result in units and the stake it needed beyond the bet. The
+    # cards list has one more entry: the shoe at the start of the round
+    # after the last one recorded.
+    from array import array
+    table = StrategyTable(table_path)
+    sessions = []
+    for seed in seeds:
+        deck = CardDeck(num_decks, random.Random(seed))
+        player = StrategyPlayer(deck, 10 ** 9, table, FlatBet(1), game_mode, num_rounds)
+        player.record = []
+        player.session_script()
+        cards = array("i", [cards for cards, count, units, extra in player.record])
+        cards.append(player.round_cards if player.voided else len(deck.deck))
+        counts = array("d", [count for cards, count, units, extra in player.record])
+        units = array("d", [units for cards, count, units, extra in player.record])
+        extras = array("d", [extra for cards, count, units, extra in player.record])
+        sessions.append((seed, cards, counts, units, extras))
+    return sessions
+
+def record_sessions_job(job):
+    return record_sessions(*job)
+
+def replay_sessions(sessions, policy, initial_balance, num_decks, game_mode, num_rounds,
+                    table_path):
+    # Replays recorded sessions with bets from the policy, and returns the
+    # final balance, rounds played and net result in bets of each. A round
+    # is replayed only when the balance covers every stake the recording
+    # took, so it is played exactly as recorded; otherwise the session goes
+    # on with live play from that round's shoe.
+    table = None
+    results = []
+    for seed, cards, counts, units, extras in sessions:
+        balance = initial_balance
+        last_bet = 0
+        last_units = 0
+        total_units = 0
+        round = 0
+        while not GameSession.over(game_mode, cards[round], round, num_rounds, balance):
+            if round < len(units):
+                bet = GameSession.place_bet(policy, balance, counts[round], last_bet, last_units)
+                if balance >= bet * (1 + extras[round]):
+                    balance += bet * units[round]
+                    last_bet = bet
+                    last_units = units[round]
+                    total_units += last_units
+                    round += 1
+                    continue
+            if table is None:
+                table = StrategyTable(table_path)
+            deck = CardDeck(num_decks, random.Random(seed))
+            while len(deck.deck) > cards[round]:
+                deck.deal_card()
+            player = StrategyPlayer(deck, balance, table, policy, game_mode, num_rounds)
+            player.round = round
+            player.last_bet = last_bet
+            player.last_units = last_units
+            player.record = []
+            player.session_script()
+            balance = player.balance
+            round = player.round
+            total_units += sum(units for cards, count, units, extra in player.record)
+            break
+        results.append((balance, round, total_units))
+    return results
+
+class SessionBatch:
+    '''
+    This class compares bet-sizing policies over many independent sessions
+    played by a StrategyPlayer through the GameSession loop.
+
+    Each session's shoe is played once, at a 1-unit bet with unlimited
+    funds, and recorded round by round. A policy is then compared by
+    replaying the recordings: bet sizes do not change the play, so while
+    the balance covers every double, split and insurance a round took, its
+    result is the recorded one times the bet. From the first round where it
+    does not, that session is played live with its real balance. The
+    results are therefore the same as playing every session live, and
+    each further policy costs a pass over the recorded rounds.
+
+    Session i shuffles its shoe with random.Random(seed + i), so every
+    policy sees the same shoes and the global random state is untouched.
+    Recording is spread over worker processes, which share the
+    memory-mapped StrategyTable. With a checkpoint_path, every finished
+    chunk of recordings is appended to that file, and a later batch with
+    the same settings only plays the sessions still missing.
+
+    Class attributes:
+    num_sessions
+    initial_balance
+    num_decks
+    game_mode
+    num_rounds
+    table_path
+    seed
+    processes
+    checkpoint_path
+    sessions
+
+    Class methods:
+    __init__
+    settings
+    load_checkpoint
+    record
+    run
+    summary
+    '''
+
+    def __init__(self, num_sessions, initial_balance, num_decks=6, num_rounds=None,
+                 table_path="showdown.bst", seed=0, processes=None, checkpoint_path=None):
+        if num_sessions < 1:
+            raise ValueError("a batch needs at least one session")
+        self.num_sessions = num_sessions
+        self.initial_balance = initial_balance
+        self.num_decks = num_decks
+        self.game_mode = "D" if num_rounds is None else "R"
+        self.num_rounds = num_rounds or 0
+        self.table_path = table_path
+        self.seed = seed
+        self.processes = processes or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path
+        self.sessions = None
+
+    def settings(self):
+        return (self.num_decks, self.game_mode, self.num_rounds, StrategyTable.header)
+
+    def load_checkpoint(self):
+        # The file holds the batch settings, then one pickled chunk of
+        # recordings per finished job. A chunk cut short by an interruption
+        # is dropped, and the file is truncated back to the last whole one.
+        import pickle
+        recorded = {}
+        if not os.path.isfile(self.checkpoint_path):
+            with open(self.checkpoint_path, "wb") as file:
+                pickle.dump(self.settings(), file)
+            return recorded
+        with open(self.checkpoint_path, "r+b") as file:
+            if pickle.load(file) != self.settings():
+                raise ValueError("{} was recorded with other settings".format(self.checkpoint_path))
+            end = file.tell()
+            while True:
+                try:
+                    for session in pickle.load(file):
+                        recorded[session[0]] = session
+                    end = file.tell()
+                except Exception:
+                    break
+            file.truncate(end)
+        return recorded
+
+    def record(self):
+        import pickle
+        recorded = self.load_checkpoint() if self.checkpoint_path else {}
+        seeds = [seed for seed in range(self.seed, self.seed + self.num_sessions)
+                 if seed not in recorded]
+        if seeds:
+            StrategyTable(self.table_path)
+            chunk = max(1, min(500, -(-len(seeds) // (4 * self.processes))))
+            jobs = [(seeds[i:i + chunk], self.num_decks, self.game_mode, self.num_rounds,
+                     self.table_path) for i in range(0, len(seeds), chunk)]
+            pool = None
+            if self.processes > 1:
+                from multiprocessing import Pool
+                pool = Pool(self.processes)
+                results = pool.imap_unordered(record_sessions_job, jobs)
+            else:
+                results = (record_sessions(*job) for job in jobs)
+            try:
+                for sessions in results:
+                    for session in sessions:
+                        recorded[session[0]] = session
+                    if self.checkpoint_path:
+                        with open(self.checkpoint_path, "ab") as file:
+                            pickle.dump(sessions, file)
+            finally:
+                if pool:
+                    pool.close()
+                    pool.join()
+        self.sessions = [recorded[seed] for seed in range(self.seed, self.seed + self.num_sessions)]
+
+    def run(self, policy):
+        if self.sessions is None:
+            self.record()
+        return replay_sessions(self.sessions, policy, self.initial_balance, self.num_decks,
+                               self.game_mode, self.num_rounds, self.table_path)
+
+    def summary(self, policy):
+        sessions = self.run(policy)
+        finals = sorted(final for final, played, units in sessions)
+        count = len(finals)
+        rounds = sum(played for final, played, units in sessions)
+        return {
+            "policy": policy.name,
+            "mean": sum(finals) / count,
+            "p5": finals[count // 20],
+            "median": finals[count // 2],
+            "p95": finals[min(count - 1, count * 19 // 20)],
+            "ruin": sum(1 for final in finals if final <= 1) / count,
+            "rounds": rounds / count,
+            "edge": sum(units for final, played, units in sessions) / max(1, rounds)}
+
+class GameCheckpoint:
+    '''
+    This class saves the state of a game of Blackjack to a local file
+    between rounds, so that an interrupted game can be resumed exactly
+    where it stopped - same shoe order, same balance, same random state.
+
+    Class attributes:
+    path
+    every
+
+    Class methods:
+    __init__
+    exists
+    due
+    save
+    load
+    clear
+    '''
+
+    version = 1
+
+    def __init__(self, path, every=1):
+        self.path = path
+        self.every = max(1, every)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def due(self, round):
+        return round % self.every == 0
+
+    def save(self, game):
+        state = {
+            "version": GameCheckpoint.version,
+            "user_name": game.user_name,
+            "game_mode": game.game_mode,
+            "num_rounds": getattr(game, "num_rounds", 0),
+            "initial_balance": game.initial_balance,
+            "balance": game.balance,
+            "round": game.round,
+            "last_bet": game.last_bet,
+            "last_units": game.last_units,
+            "deck": game.deck.save_state().hex(),
+            "exported_rows": game.exporter.rows if game.exporter else None,
+            "random_state": random.getstate()}
+        # Write to a temporary file first, so a crash mid-write never
+        # leaves a truncated checkpoint behind.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def load(self, game):
+        with open(self.path) as file:
+            state = json.load(file)
+        if state["version"] != GameCheckpoint.version:
+            raise ValueError("unsupported checkpoint version")
+        game.user_name = state["user_name"]
+        game.game_mode = state["game_mode"]
+        game.num_rounds = state["num_rounds"]
+        game.initial_balance = state["initial_balance"]
+        game.balance = state["balance"]
+        game.round = state["round"]
+        game.last_bet = state.get("last_bet", 0)
+        game.last_units = state.get("last_units", 0)
+        game.deck = CardDeck(0)
+        game.deck.load_state(bytes.fromhex(state["deck"]))
+        version, internal, gauss = state["random_state"]
+        random.setstate((version, tuple(internal), gauss))
+        # Rows exported after this checkpoint belong to rounds that are
+        # about to be played again.
+        if game.exporter and state.get("exported_rows") is not None:
+            game.exporter.truncate(state["exported_rows"])
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
+
+class GameAction(GameSession):
     '''
     This class handles all the interactions with the user,
-    and represents a full game of Blackjack.
+    and represents a full game of Blackjack. With a bet-sizing policy,
+    the policy places every bet instead of the user.
 
     Class attributes:
     round
@@ -373,9 +1435,16 @@ class GameAction:
     initial_balance
     balance
     roundx
+    checkpoint
+    exporter
+    advisor
+    policy
+    last_bet
+    last_units
 
     Class methods:
     __init__
+    resume_script
     welcome_script
     game_script
     round_script
@@ -384,19 +1453,51 @@ class GameAction:
     split_script
     hit_script
     settle_script
+    checkpoint_script
+    void_script
+    advise_script
+    advise_insurance_script
+    advise_split_script
     '''
 
-    def __init__(self):
+    def __init__(self, checkpoint_path=None, checkpoint_every=1,
+                 export_path=None, advisor=False, policy=None):
         print(80 * "-")
         print("{:^80s}".format("♦ ♠ ♥ ♣ BLACKJACK ♣ ♥ ♠ ♦"))
         print(80 * "-")
         print("{:>80s}".format("\u00A9 2020 Lucas Brossi"))
         print("{:>80s}".format("All rights reserved"))
         print("")
-        self.welcome_script()
-        self.round = 0
+        self.checkpoint = GameCheckpoint(checkpoint_path, checkpoint_every) if checkpoint_path else None
+        self.exporter = RoundExporter(export_path) if export_path else None
+        self.advisor = DecisionAdvisor() if advisor else None
+        self.policy = policy
+        self.last_bet = 0
+        self.last_units = 0
+        if not self.resume_script():
+            self.welcome_script()
+            self.round = 0
         self.game_script()
 
+    def resume_script(self):
+        if not self.checkpoint or not self.checkpoint.exists():
+            return False
+        user_resume = input("Press C to Continue your saved game or any other key to start a new one. ").upper()
+        print("")
+        # A declined saved game stays on disk until the new game's first
+        # checkpoint replaces it.
+        if user_resume != "C":
+            return False
+        try:
+            self.checkpoint.load(self)
+        except (OSError, ValueError, KeyError, TypeError):
+            print("Sorry, your saved game could not be loaded.")
+            print("")
+            return False
+        print("Welcome back, {}! Let's pick up after round {}.".format(self.user_name, self.round))
+        print("")
+        return True
+
     def welcome_script(self):
         print("Hi, welcome to BlackJack! The most thrilling casino game!")
         self.user_name = input("What's your name? ")
@@ -468,19 +1569,17 @@ class GameAction:
         print("")
 
     def game_script(self):
-        if self.game_mode == "D":
-            while len(self.deck.deck) > 10 and self.balance > 1:
-                self.round_script()
-        else:
-            while (self.num_rounds - self.round) > 0 and self.balance > 1:
-                self.round_script()
+        self.session_script()
+        if self.checkpoint:
+            self.checkpoint.clear()
+        if self.exporter:
+            self.exporter.close()
         print("End of game! You've played " + str(self.round) + " rounds!")
         print(80 * '-')
         print("You invested: ${:,.2f} | Your final balance: ${:,.2f}".format(self.initial_balance, self.balance))
         print('')
 
     def round_script(self):
-        self.round += 1
         print(80 * "#")
         print("{:^80s}".format("♦ ♠ ♥ ♣ ROUND " + str(self.round) + " ♣ ♥ ♠ ♦"))
         print(80 * "#")
@@ -510,6 +1609,14 @@ class GameAction:
             self.settle_script()
 
     def bet_script(self):
+        if self.policy:
+            user_bet = self.policy_bet()
+            print("Your bet for this round is: ${:,.2f}".format(user_bet))
+            print("")
+            self.last_bet = user_bet
+            self.balance -= user_bet
+            self.roundx = GameRound(self.deck, user_bet)
+            return
         while True:
             try:
                 user_bet = int(input("Place your bet for this round: "))
@@ -526,11 +1633,13 @@ class GameAction:
                 print("Sorry, we only accept positive integer bets.")
                 print("")
         print("")
+        self.last_bet = user_bet
         self.balance -= user_bet
         self.roundx = GameRound(self.deck, user_bet)
 
     def insurance_script(self):
         if self.roundx.insurable() and self.balance >= (self.roundx.player.bet / 2):
+            self.advise_insurance_script()
             user_insure = input("Press I to buy Insurance of ${:,.2f} or any other key to skip".format(self.roundx.player.bet / 2)).upper()
             print("")
             if user_insure == "I":
@@ -539,6 +1648,7 @@ class GameAction:
 
     def split_script(self):
         if self.roundx.player.splittable() and self.balance >= self.roundx.player.bet:
+            self.advise_split_script(self.roundx.player)
             user_action = input("Press S to Split or any other key to skip. ").upper()
             print("")
             if user_action == "S":
@@ -546,6 +1656,7 @@ class GameAction:
                 self.roundx.split(self.roundx.player, self.deck)
                 self.roundx.print_playerhands()
                 if self.roundx.player.splittable() and self.balance >= self.roundx.player.bet:
+                    self.advise_split_script(self.roundx.player)
                     user_action = input("Press S to Split or any other key to skip. ").upper()
                     print("")
                     if user_action == "S":
@@ -553,6 +1664,7 @@ class GameAction:
                         self.roundx.split(self.roundx.player, self.deck)
                         self.roundx.print_playerhands()
                         if self.roundx.player.splittable() and self.balance >= self.roundx.player.bet:
+                            self.advise_split_script(self.roundx.player)
                             user_action = input("Press S to Split or any other key to skip. ").upper()
                             print("")
                             if user_action == "S":
@@ -560,6 +1672,7 @@ class GameAction:
                                 self.roundx.split(self.roundx.player, self.deck)
                                 self.roundx.print_playerhands()
                         if self.roundx.split2.splittable() and self.balance >= self.roundx.player.bet:
+                            self.advise_split_script(self.roundx.split2)
                             user_action = input("Press S to Split or any other key to skip. ").upper()
                             print("")
                             if user_action == "S":
@@ -567,6 +1680,7 @@ class GameAction:
                                 self.roundx.split(self.roundx.split2, self.deck)
                                 self.roundx.print_playerhands()
                 if self.roundx.split1.splittable() and self.balance >= self.roundx.player.bet:
+                    self.advise_split_script(self.roundx.split1)
                     user_action = input("Press S to Split or any other key to skip. ").upper()
                     print("")
                     if user_action == "S":
@@ -574,6 +1688,7 @@ class GameAction:
                         self.roundx.split(self.roundx.split1, self.deck)
                         self.roundx.print_playerhands()
                         if self.roundx.split1.splittable() and self.balance >= self.roundx.player.bet:
+                            self.advise_split_script(self.roundx.split1)
                             user_action = input("Press S to Split or any other key to skip. ").upper()
                             print("")
                             if user_action == "S":
@@ -581,6 +1696,7 @@ class GameAction:
                                 self.roundx.split(self.roundx.split1, self.deck)
                                 self.roundx.print_playerhands()
                         if self.roundx.split2.splittable() and self.balance >= self.roundx.player.bet:
+                            self.advise_split_script(self.roundx.split2)
                             user_action = input("Press S to Split or any other key to skip. ").upper()
                             print("")
                             if user_action == "S":
@@ -590,6 +1706,7 @@ class GameAction:
 
     def hit_script(self, hand):
         if self.balance >= hand.bet and self.roundx.split_count == 0:
+            self.advise_script(hand, ["H", "S", "DD", "R"])
             loop = True
             while loop:
                 user_action = input("Press H for Hit, S for Stand, DD for Double-Down, or R for suRrender. ").upper()
@@ -614,6 +1731,7 @@ class GameAction:
                 self.roundx.print_playerhands()
                 loop = True
                 while hand.score() < 21 and loop:
+                    self.advise_script(hand, ["H", "S", "DD"])
                     loop2 = True
                     while loop2:
                         user_action = input("Press H for Hit, S for Stand, or DD for Double-Down. ").upper()
@@ -635,6 +1753,7 @@ class GameAction:
                         self.roundx.print_playerhands()
                 hand.stand()
         elif self.balance >= hand.bet and self.roundx.split_count > 0:
+            self.advise_script(hand, ["H", "S", "DD"])
             loop = True
             while loop:
                 user_action = input("Press H for Hit, S for Stand, or DD for Double-Down. ").upper()
@@ -654,6 +1773,7 @@ class GameAction:
                 self.roundx.print_playerhands()
                 loop = True
                 while hand.score() < 21 and loop:
+                    self.advise_script(hand, ["H", "S", "DD"])
                     loop2 = True
                     while loop2:
                         user_action = input("Press H for Hit, S for Stand, or DD for Double-Down. ").upper()
@@ -675,6 +1795,7 @@ class GameAction:
                         self.roundx.print_playerhands()
                 hand.stand()
         elif self.balance < hand.bet and self.roundx.split_count == 0:
+            self.advise_script(hand, ["H", "S", "R"])
             loop = True
             while loop:
                 user_action = input("Press H for Hit, S for Stand, or R for suRrender. ").upper()
@@ -695,6 +1816,7 @@ class GameAction:
                 self.roundx.print_playerhands()
                 loop = True
                 while hand.score() < 21 and loop:
+                    self.advise_script(hand, ["H", "S"])
                     loop2 = True
                     while loop2:
                         user_action = input("Press H for Hit, or S for Stand. ").upper()
@@ -711,6 +1833,7 @@ class GameAction:
                         self.roundx.print_playerhands()
                 hand.stand()
         else:
+            self.advise_script(hand, ["H", "S"])
             loop = True
             while loop:
                 user_action = input("Press H for Hit, or S for Stand. ").upper()
@@ -726,6 +1849,7 @@ class GameAction:
                 self.roundx.print_playerhands()
                 loop = True
                 while hand.score() < 21 and loop:
+                    self.advise_script(hand, ["H", "S"])
                     loop2 = True
                     while loop2:
                         user_action = input("Press H for Hit, or S for Stand. ").upper()
@@ -746,5 +1870,92 @@ class GameAction:
         self.roundx.settle(self.deck)
         self.balance += self.roundx.winnings
         self.roundx.print_settle()
+        if self.exporter:
+            self.exporter.record(self.round, self.roundx, self.balance)
+
+    def checkpoint_script(self):
+        if self.checkpoint and self.checkpoint.due(self.round):
+            # Rounds already exported must reach disk before the
+            # checkpoint says they were played.
+            if self.exporter:
+                self.exporter.flush()
+            self.checkpoint.save(self)
 
-game = GameAction()
+    def void_script(self):
+        print("")
+        print("The deck is over in the middle of this round! All its bets are given back.")
+        print("")
+
+    def advise_script(self, hand, actions):
+        if self.advisor:
+            evs = self.advisor.hand_evs(self.roundx, self.deck, hand, actions)
+            print("Advisor (EV per $ bet): " + " | ".join(
+                "{} {:+.3f}".format(action, ev) for action, ev in evs.items()))
+
+    def advise_insurance_script(self):
+        if self.advisor:
+            ev = self.advisor.insurance_ev(self.roundx, self.deck)
+            print("Advisor (EV per $ of insurance): Insurance {:+.3f} | Skip +0.000".format(ev))
+
+    def advise_split_script(self, hand):
+        if self.advisor:
+            actions = ["H", "S", "DD"] if self.roundx.split_count > 0 else ["H", "S", "DD", "R"]
+            evs = self.advisor.hand_evs(self.roundx, self.deck, hand, ["P"] + actions)
+            print("Advisor (EV per $ bet): Split {:+.3f} | No split {:+.3f}".format(
+                evs.pop("Split"), max(evs.values())))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Play a game of Blackjack.")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="save the game to FILE between rounds, and offer to resume from it; "
+                             "with --simulate, keep the recorded sessions in FILE")
+    parser.add_argument("--checkpoint-every", type=int, default=1,
+                        help="save the game every N rounds")
+    parser.add_argument("--export", metavar="DIR",
+                        help="write a record of every round to column files in DIR")
+    parser.add_argument("--advisor", action="store_true",
+                        help="show the expected value of each action at every decision")
+    parser.add_argument("--policy", choices=["flat", "kelly", "martingale", "spread"],
+                        help="let a bet-sizing policy place every bet of the game")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="compare bet-sizing policies over N automated sessions instead of playing")
+    parser.add_argument("--decks", type=int, default=6,
+                        help="number of decks in each simulated session")
+    parser.add_argument("--rounds", type=int,
+                        help="play this many rounds per simulated session instead of the whole deck")
+    parser.add_argument("--balance", type=int, default=1000,
+                        help="initial balance of each simulated session")
+    parser.add_argument("--unit", type=int, default=10,
+                        help="base bet of the bet-sizing policies")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first simulated session")
+    args = parser.parse_args()
+    if args.simulate is not None:
+        if args.simulate < 1:
+            parser.error("--simulate needs at least one session")
+        num_decks = args.rounds * 10 // 52 + 1 if args.rounds else args.decks
+        batch = SessionBatch(args.simulate, args.balance, num_decks, args.rounds,
+                             seed=args.seed, checkpoint_path=args.checkpoint)
+        try:
+            batch.record()
+        except ValueError as error:
+            parser.error(str(error))
+        # Kelly sizes its bets from the edge that flat betting measures.
+        flat = batch.summary(FlatBet(args.unit))
+        policies = [KellyBet(0.5, base_edge=flat["edge"], unit=args.unit),
+                    MartingaleBet(args.unit),
+                    SpreadBet(args.unit)]
+        print("{:<16s}{:>12s}{:>12s}{:>12s}{:>12s}{:>8s}{:>8s}".format(
+            "Policy", "Mean", "5%", "Median", "95%", "Ruin", "Rounds"))
+        print(80 * "-")
+        for result in [flat] + [batch.summary(policy) for policy in policies]:
+            print("{:<16s}{:>12,.2f}{:>12,.2f}{:>12,.2f}{:>12,.2f}{:>8.1%}{:>8.1f}".format(
+                result["policy"], result["mean"], result["p5"], result["median"],
+                result["p95"], result["ruin"], result["rounds"]))
+    else:
+        policies = {"flat": FlatBet, "kelly": KellyBet, "martingale": MartingaleBet,
+                    "spread": SpreadBet}
+        policy = policies[args.policy](unit=args.unit) if args.policy else None
+        game = GameAction(args.checkpoint, args.checkpoint_every, args.export,
+                          args.advisor, policy)